@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-import plotly.graph_objects as go
 import re
 import requests
 import io
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
 
 # --- CONFIGURATION ---
 PRIMARY_COLOR = "#1E3A8A" # Dark professional blue
@@ -12,6 +17,7 @@ SECONDARY_COLOR = "#4B5563" # Muted text gray
 BACKGROUND_COLOR = "#F0F2F6" # Very light background
 CARD_COLOR = "#FFFFFF"
 COLOR_SEQUENCE = ["#1E3A8A", "#636EF5", "#A3A7F4", "#C6C9F9", "#00A86B", "#FFD700", "#DC3545"] # Expanded sequence for charts
+STATUS_COLOR_MAP = {"Completed": "#28a745", "In Progress": "#DC3545", "N/A": "#6c757d"} # Green/Red/Gray for status
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -21,7 +27,7 @@ st.set_page_config(
 )
 
 # --- CUSTOM CSS (Professional Styling) ---
-st.markdown(f"""
+CSS_BLOCK = f"""
     <style>
     /* Global overrides for a clean look */
     .stApp {{
@@ -99,12 +105,14 @@ st.markdown(f"""
         margin-bottom: 2rem;
     }}
     </style>
-""", unsafe_allow_html=True)
+"""
+# Re-sent on every run: Streamlit drops elements a rerun does not emit, so the styles cannot be injected only once
+st.markdown(CSS_BLOCK, unsafe_allow_html=True)
 
 
 # --- PLOTLY CONFIGURATION (Professional Theme and Text Size) ---
 # Define a base layout template for clean, readable charts
-BASE_LAYOUT = go.Layout(
+BASE_LAYOUT = dict( # Plain dict; fig.update_layout accepts it without a graph_objects Layout
     template='plotly_white', # Professional white theme
     font=dict(size=12, family="Arial"), # Consistent global font size
     title_font_size=18,
@@ -121,81 +129,110 @@ def update_fig_layout(fig):
     return fig
 
 # --- PROJECT CATEGORIZATION LOGIC ---
-def categorize_project_revised(description):
-    """
-    Categorizes a project description into one of the predefined types.
-    """
-    desc = str(description).upper()
-    
+def _keywords(*words):
+    """Builds an alternation regex matching any of the given literal keywords."""
+    return "|".join(re.escape(w) for w in words)
+
+# Ordered by priority: the first matching category wins.
+CATEGORY_PATTERNS = [
     # 1. AWC Building
-    if 'ANGANWADI' in desc or 'AWC' in desc:
-        return 'AWC Building'
-    
+    ("AWC Building", re.compile(_keywords('ANGANWADI', 'AWC'))),
     # 2. Medical Building (Health facilities/hospitals/colleges)
-    if 'HOSPITAL' in desc or 'PHC' in desc or 'SUB HEALTH CENTER' in desc or ('MEDICAL' in desc and ('COLLEGE' in desc or 'HEALTH' in desc)):
-        return 'Medical Building'
-    
+    ("Medical Building", re.compile(
+        _keywords('HOSPITAL', 'PHC', 'SUB HEALTH CENTER')
+        + r"|(?s:MEDICAL.*(?:COLLEGE|HEALTH)|(?:COLLEGE|HEALTH).*MEDICAL)"
+    )),
     # 3. School/Hostel/Education Building
-    if 'SCHOOL' in desc or 'KGBV' in desc or 'ZPHS' in desc or 'HOSTEL' in desc or 'PATASHALA' in desc or 'EDUCATION' in desc or 'LIBRARY' in desc:
-        return 'School/Hostel'
-    
+    ("School/Hostel", re.compile(_keywords(
+        'SCHOOL', 'KGBV', 'ZPHS', 'HOSTEL', 'PATASHALA', 'EDUCATION', 'LIBRARY'
+    ))),
     # 4. Water/Borewell
-    if 'BORE WELL' in desc or 'SUBMERSIBLE PUMPSET' in desc or 'WATER SUPPLY' in desc or 'RWS' in desc or 'SUMP' in desc or 'OVERHEAD' in desc or 'PIPELINE' in desc:
-        return 'Water/Borewell'
-    
+    ("Water/Borewell", re.compile(_keywords(
+        'BORE WELL', 'SUBMERSIBLE PUMPSET', 'WATER SUPPLY', 'RWS', 'SUMP', 'OVERHEAD', 'PIPELINE'
+    ))),
     # 5. CC Road/Drain
-    if 'CC ROAD' in desc or 'CC DRAIN' in desc or 'SIDE DRAIN' in desc:
-        return 'CC Road/Drain'
-    
+    ("CC Road/Drain", re.compile(_keywords('CC ROAD', 'CC DRAIN', 'SIDE DRAIN'))),
     # 6. Major Road/Bridge
-    if 'PWD ROAD' in desc or 'ZP ROAD' in desc or 'RNB' in desc or 'RENEWAL' in desc or 'WIDENING' in desc or 'STRENGTHENING' in desc or 'BRIDGE' in desc or 'ROAD' in desc or 'R/F' in desc or 'IMPROVEMENTS' in desc:
-        return 'Major Road/Bridge'
-    
+    ("Major Road/Bridge", re.compile(_keywords(
+        'PWD ROAD', 'ZP ROAD', 'RNB', 'RENEWAL', 'WIDENING', 'STRENGTHENING', 'BRIDGE', 'ROAD', 'R/F', 'IMPROVEMENTS'
+    ))),
     # 7. Other Building/Civil Works (General/Miscellaneous buildings, including quarters)
-    if 'BUILDING' in desc or 'GP' in desc or 'MPP' in desc or 'COMMUNITY HALL' in desc or 'MARKET' in desc or 'BUS STAND SHELTER' in desc or 'TEMPLE' in desc or 'MASJID' in desc or 'COMPLEX' in desc or 'WALL' in desc or 'PACS' in desc or 'ARCH GATE' in desc or 'PILGRIM SHED' in desc or 'PRASADAM COUNTERS' in desc or 'KALYANA KATTA' in desc or 'VAIKUNTA DHAMAM' in desc or 'COMPOUND WALL' in desc or 'ELECTRICAL' in desc or 'VIGRAHAM' in desc or 'HARATHI' in desc or 'PILLARS' in desc or 'CONSTRUCTION OF' in desc or 'BALANCE WORK' in desc or 'FORMATION' in desc or 'QUARTERS' in desc or 'RESIDENTIAL' in desc:
-        return 'Other Building/Civil Works'
-        
-    return 'Uncategorized'
+    ("Other Building/Civil Works", re.compile(_keywords(
+        'BUILDING', 'GP', 'MPP', 'COMMUNITY HALL', 'MARKET', 'BUS STAND SHELTER', 'TEMPLE', 'MASJID', 'COMPLEX',
+        'WALL', 'PACS', 'ARCH GATE', 'PILGRIM SHED', 'PRASADAM COUNTERS', 'KALYANA KATTA', 'VAIKUNTA DHAMAM',
+        'COMPOUND WALL', 'ELECTRICAL', 'VIGRAHAM', 'HARATHI', 'PILLARS', 'CONSTRUCTION OF', 'BALANCE WORK',
+        'FORMATION', 'QUARTERS', 'RESIDENTIAL'
+    ))),
+]
+
+# Category levels in sorted order, matching what astype("category") would produce
+PROJECT_TYPES = sorted([label for label, _ in CATEGORY_PATTERNS] + ['Uncategorized'])
+
+def categorize_series(work_names):
+    """
+    Categorizes a Series of project descriptions into the predefined types.
+    Runs one vectorized regex pass per category instead of a Python loop per row.
+    """
+    # Cast and uppercase once; every category pass reuses this column
+    upper = work_names.astype("string").str.upper().fillna("")
+    # Fill integer codes and wrap them as a categorical, skipping a per-row label array and its re-hash
+    codes = np.full(len(upper), PROJECT_TYPES.index('Uncategorized'), dtype=np.int8)
+    unassigned = np.ones(len(upper), dtype=bool)
+    for label, pattern in CATEGORY_PATTERNS:
+        mask = upper.str.contains(pattern).to_numpy(dtype=bool) & unassigned
+        codes[mask] = PROJECT_TYPES.index(label)
+        unassigned &= ~mask
+    return pd.Series(pd.Categorical.from_codes(codes, categories=PROJECT_TYPES), index=work_names.index, name="Project Type")
 
 
 # --- HELPER FUNCTIONS ---
 
-def normalize_budget(value):
-    """Standardizes budget strings to Float (Lakhs)."""
-    if pd.isna(value):
-        return 0.0
-    s_val = str(value).lower().replace(',', '').strip()
-    numeric_part = re.findall(r"[-+]?\d*\.\d+|\d+", s_val)
-    if not numeric_part:
-        return 0.0
-    number = float(numeric_part[0])
-    if "crore" in s_val or "cr" in s_val:
-        return number * 100
-    elif "lakh" in s_val:
-        return number
-    elif number > 10000: 
-        return number / 100000
-    else:
-        return number
+BUDGET_NUMBER_PATTERN = re.compile(r"([-+]?\d*\.\d+|\d+)")
+
+def normalize_budget_series(values):
+    """Standardizes a whole budget column to Float (Lakhs): crores x100, lakhs as-is, raw rupees above 10000 / 100000."""
+    # No strip(): surrounding whitespace changes neither the extracted number nor the unit checks
+    s_val = values.astype("string").str.lower().str.replace(',', '', regex=False)
+    number = pd.to_numeric(s_val.str.extract(BUDGET_NUMBER_PATTERN, expand=False), errors='coerce').fillna(0.0)
+    is_crore = s_val.str.contains("cr", regex=False, na=False)  # also covers "crore"
+    is_lakh = s_val.str.contains("lakh", regex=False, na=False)
+    # Divide rather than multiply by 1/100000, so 150000 gives exactly 1.5
+    normalized = np.where(is_crore, number * 100, np.where(is_lakh | (number <= 10000), number, number / 100000))
+    return pd.Series(normalized, index=values.index, dtype=float)
+
+CATEGORY_COLUMNS = ("Mandal", "Department", "Status Label")
+STATUS_LABEL_DTYPE = pd.CategoricalDtype(["Completed", "In Progress", "N/A"])
+MISSING_VALUES = ("nan", "", "none", "nat") # Lowercased placeholders Excel/pandas leave in empty cells
+
+# Header substring -> canonical column name; the first matching rule wins
+COLUMN_RULES = (
+    ("work name", "Work Name"),
+    ("budget", "Budget (Lakhs)"),
+    ("mandal", "Mandal"),
+    ("village", "Village"),
+    ("agency", "Agency"),
+    ("contractor", "Contractor"),
+    ("stage", "Status"),
+    ("issues", "Issues"),
+    ("completed", "Is Completed"),
+    ("admin sanction date", "Sanction Date"),
+    ("scheme", "Scheme"),
+    ("priority", "Priority"),
+    ("sl. no", "Sl. No."),
+)
+
+def has_real_issue(issues):
+    """Flags Issues entries holding real text (not blank, 'nan' or a '-' placeholder)."""
+    return (issues.str.len() > 1) & (issues.str.lower() != "nan") & (issues.str.strip() != "-")
 
 def clean_dataframe(df, dept_name=None):
     """Standardizes column names and adds Department column."""
     col_map = {}
     for col in df.columns:
         c_lower = str(col).lower()
-        if "work name" in c_lower: col_map[col] = "Work Name"
-        elif "budget" in c_lower: col_map[col] = "Budget (Lakhs)"
-        elif "mandal" in c_lower: col_map[col] = "Mandal"
-        elif "village" in c_lower: col_map[col] = "Village"
-        elif "agency" in c_lower: col_map[col] = "Agency"
-        elif "contractor" in c_lower: col_map[col] = "Contractor"
-        elif "stage" in c_lower: col_map[col] = "Status"
-        elif "issues" in c_lower: col_map[col] = "Issues"
-        elif "completed" in c_lower: col_map[col] = "Is Completed"
-        elif "admin sanction date" in c_lower: col_map[col] = "Sanction Date"
-        elif "scheme" in c_lower: col_map[col] = "Scheme"
-        elif "priority" in c_lower: col_map[col] = "Priority"
-        elif "sl. no" in c_lower: col_map[col] = "Sl. No."
+        canonical = next((canon for sub, canon in COLUMN_RULES if sub in c_lower), None)
+        if canonical:
+            col_map[col] = canonical
 
     df = df.rename(columns=col_map)
     
@@ -205,72 +242,355 @@ def clean_dataframe(df, dept_name=None):
     
     # Clean Budget
     if "Budget (Lakhs)" in df.columns:
-        df["Normalized Budget"] = df["Budget (Lakhs)"].apply(normalize_budget)
+        df["Normalized Budget"] = normalize_budget_series(df["Budget (Lakhs)"])
     else:
         df["Normalized Budget"] = 0.0
 
     # Clean Mandal
     if "Mandal" in df.columns:
-        df["Mandal"] = df["Mandal"].fillna("N/A")
-        df["Mandal"] = df["Mandal"].astype(str).str.strip().str.title()
-        df.loc[df["Mandal"].isin(["Nan", "NaN", "", "None", "Nat"]), "Mandal"] = "N/A"
+        mandal = df["Mandal"].astype("string").str.strip()
+        missing = mandal.isna() | mandal.str.lower().isin(MISSING_VALUES)
+        df["Mandal"] = mandal.str.title().where(~missing, "N/A")
     else:
         df["Mandal"] = "N/A"
 
     # Clean Priority (Ensure 0 or 1)
     if "Priority" not in df.columns:
-        df["Priority"] = 0
+        df["Priority"] = np.zeros(len(df), dtype=np.int8)
     else:
         # Convert to numeric, errors become NaN, then fill with 0
-        df["Priority"] = pd.to_numeric(df["Priority"], errors='coerce').fillna(0).astype(int)
+        priority = pd.to_numeric(df["Priority"], errors='coerce').fillna(0).astype(int)
+        # 0/1 flags fit int8; downcast picks the smallest integer type that holds every value
+        df["Priority"] = pd.to_numeric(priority, downcast="integer")
 
     # Clean Completion Status
-    def determine_status(row):
-        if "Is Completed" in row and row["Is Completed"] == 1:
-            return "Completed"
-        if "Status" in row:
-            val = str(row["Status"]).lower().strip()
-            if val in ["nan", "none", "", "nat"]:
-                return "N/A"
-            if "complete" in val:
-                return "Completed"
-            return "In Progress"
-        return "N/A"
-
-    df["Status Label"] = df.apply(determine_status, axis=1)
+    if "Is Completed" in df.columns:
+        is_completed = df["Is Completed"].eq(1).to_numpy()
+    else:
+        is_completed = np.zeros(len(df), dtype=bool)
+    if "Status" in df.columns:
+        status = df["Status"].astype("string").str.lower().str.strip()
+        status_missing = (status.isna() | status.isin(MISSING_VALUES)).to_numpy()
+        is_completed = is_completed | status.str.contains("complete", regex=False, na=False).to_numpy()
+        codes = np.select([is_completed, status_missing], [0, 2], default=1)
+    else:
+        codes = np.where(is_completed, 0, 2)
+    # Fixed levels: every sheet shares one dtype, so the label never goes through a string array
+    df["Status Label"] = pd.Categorical.from_codes(codes, dtype=STATUS_LABEL_DTYPE)
+    df["_is_completed"] = is_completed
 
     # Clean Issues
     if "Issues" in df.columns:
         df["Issues"] = df["Issues"].fillna("").astype(str)
     else:
         df["Issues"] = ""
+    df["_has_issue"] = has_real_issue(df["Issues"])
+
+    # Low-cardinality labels as categoricals (int codes for groupby/compare, less memory)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
 
     return df
 
-def load_data(file_obj):
+def content_digest(file_bytes):
+    """Fixed-size blake2b digest of workbook bytes, used as the cache key for the raw file."""
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+def load_sheets(file_bytes):
+    """Parses every sheet of an Excel workbook (header on the second row); build_data_sheets caches the result."""
+    try:
+        # Rust-backed calamine parser (pandas >= 2.2) is several times faster than openpyxl
+        return pd.read_excel(io.BytesIO(file_bytes), sheet_name=None, header=1, engine="calamine")
+    except (ImportError, ValueError):
+        return pd.read_excel(io.BytesIO(file_bytes), sheet_name=None, header=1)
+
+# On-disk Parquet copies of cleaned workbooks, so a restarted app skips Excel parsing.
+# Keyed by workbook content and by this script's source, so code changes invalidate them.
+# Per-user and private (0o700): entry names are predictable, so a shared temp dir would let others plant sheets.
+SHEET_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "civil_works"
+SCRIPT_VERSION = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=8).hexdigest()
+MAX_DATA_VERSIONS = 3 # Workbook versions each data cache keeps before evicting the oldest
+MAX_FILTER_ENTRIES = 32 # Department/filter combinations kept by the per-view caches
+
+def to_parquet_safe(df):
+    """Casts mixed-type object columns (e.g. numbers mixed with text) to strings so Arrow can store them."""
+    mixed = [c for c in df.columns if df[c].dtype == object and pd.api.types.infer_dtype(df[c]) not in ("string", "empty")]
+    return df.astype({c: "string" for c in mixed})
+
+def read_sheet_cache(cache_dir):
     try:
-        xls = pd.read_excel(file_obj, sheet_name=None, header=1)
-        return xls
+        sheet_names = json.loads((cache_dir / "sheets.json").read_text())
+        data_sheets = {name: pd.read_parquet(cache_dir / f"{i}.parquet") for i, name in enumerate(sheet_names)}
+        os.utime(cache_dir) # Mark as recently used so prune_sheet_cache keeps the entry serving reads
+        return data_sheets
+    except Exception:
+        return None
+
+def write_sheet_cache(cache_dir, data_sheets):
+    try:
+        SHEET_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        SHEET_CACHE_DIR.chmod(0o700) # Also tightens a directory left by an older version
+        cache_dir.mkdir(mode=0o700, exist_ok=True)
+        for i, df in enumerate(data_sheets.values()):
+            df.to_parquet(cache_dir / f"{i}.parquet", compression="zstd")
+        # Written last: its presence marks the cache entry as complete
+        (cache_dir / "sheets.json").write_text(json.dumps(list(data_sheets.keys())))
+        prune_sheet_cache(keep=cache_dir)
+    except Exception:
+        pass # Best effort; the in-memory caches still apply
+
+def prune_sheet_cache(keep):
+    """Deletes all but the MAX_DATA_VERSIONS most recently used cache entries (always keeping `keep`) so the directory stays bounded."""
+    entries = sorted((d for d in SHEET_CACHE_DIR.iterdir() if d.is_dir() and d != keep), key=lambda d: d.stat().st_mtime, reverse=True)
+    for stale in entries[MAX_DATA_VERSIONS - 1:]:
+        shutil.rmtree(stale, ignore_errors=True)
+
+@st.cache_data(show_spinner=False, max_entries=MAX_DATA_VERSIONS, hash_funcs={bytes: content_digest})
+def build_data_sheets(file_bytes):
+    """Loads and cleans every sheet of a workbook, keyed by sheet (department) name."""
+    cache_dir = SHEET_CACHE_DIR / f"{SCRIPT_VERSION}-{content_digest(file_bytes)}"
+    data_sheets = read_sheet_cache(cache_dir)
+    if data_sheets is None:
+        data_sheets = {sheet_name: to_parquet_safe(clean_dataframe(df, sheet_name)) for sheet_name, df in load_sheets(file_bytes).items()}
+        write_sheet_cache(cache_dir, data_sheets)
+    return data_sheets
+
+def load_data(file_bytes):
+    try:
+        return build_data_sheets(file_bytes)
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return None
 
+MASTER_COLUMNS = (
+    "Sl. No.", "Work Name", "Department", "Village", "Mandal", "Status Label", "Budget (Lakhs)",
+    "Normalized Budget", "Issues", "Contractor", "Priority", "_has_issue", "_is_completed",
+)
+
+@st.cache_data(show_spinner=False, max_entries=MAX_DATA_VERSIONS)
+def assemble_master(data_key, _data_sheets):
+    """Combines all department sheets into one categorized frame, cached per data_key."""
+    # Only the columns the Home view reads; department-specific extras stay on the per-sheet frames
+    frames = [frame[[c for c in MASTER_COLUMNS if c in frame.columns]] for frame in _data_sheets.values()]
+    # Sheets carry different categories, which concat would fall back to object for;
+    # recoding each sheet onto the union of levels keeps the codes and skips a string round trip
+    for col in CATEGORY_COLUMNS:
+        columns = [frame[col] for frame in frames if col in frame.columns]
+        if columns and all(isinstance(c.dtype, pd.CategoricalDtype) for c in columns):
+            dtype = pd.CategoricalDtype(sorted(set().union(*(c.cat.categories for c in columns))))
+            frames = [frame.astype({col: dtype}) if col in frame.columns else frame for frame in frames]
+    master_df = pd.concat(frames, ignore_index=True)
+    for col in CATEGORY_COLUMNS:
+        if col in master_df.columns:
+            master_df[col] = master_df[col].astype("category") # No-op when the levels were aligned above
+    if not master_df.empty and "Work Name" in master_df.columns:
+        master_df["Project Type"] = categorize_series(master_df["Work Name"])
+    return master_df
+
+def count_by(df, keys, name="Count"):
+    """Row counts per key combination, with keys as plain strings for Plotly."""
+    if isinstance(keys, str):
+        # Single key: value_counts skips the groupby machinery (a bincount on categorical codes)
+        counts = df[keys].value_counts(sort=False)
+        counts = counts[counts > 0].rename_axis(keys).reset_index(name=name) # Drop unused categories
+        return counts.astype({keys: str})
+    counts = df.groupby(keys, observed=True).size().reset_index(name=name)
+    return counts.astype({key: str for key in keys})
+
+@st.cache_data(show_spinner=False, max_entries=MAX_DATA_VERSIONS)
+def compute_summary(master_key, _master_df):
+    """Computes the Home view KPIs and chart aggregates once per master_key."""
+    has_issue = _master_df["_has_issue"]
+    total_projects = len(_master_df)
+    # One Department grouping serves both the per-department totals and the issue counts
+    by_dept = _master_df.groupby("Department", observed=True).agg(
+        **{"Total Works": ("_has_issue", "size"), "Count": ("_has_issue", "sum")}
+    ).reset_index().astype({"Department": str})
+    completed_total = int(_master_df["_is_completed"].sum())
+    summary = {
+        "total_projects": total_projects,
+        "total_investment": _master_df["Normalized Budget"].sum(),
+        "total_issues": int(has_issue.sum()),
+        "completed_total": completed_total,
+        "completion_rate": int((completed_total / total_projects * 100)) if total_projects > 0 else 0,
+        "status_by_dept": count_by(_master_df, ["Department", "Status Label"]),
+        "total_works_per_dept": by_dept[["Department", "Total Works"]],
+        "issues_count": by_dept.loc[by_dept["Count"] > 0, ["Department", "Count"]].reset_index(drop=True),
+    }
+    if "Project Type" in _master_df.columns:
+        summary["project_type_counts"] = count_by(_master_df, ["Department", "Project Type"])
+    return summary
+
+@st.cache_data(show_spinner=False, max_entries=MAX_FILTER_ENTRIES)
+def filter_department(master_key, dept, sel_mandal, show_pending, show_issues, show_priority, _df):
+    """Applies the Department view filters to _df as one combined mask, cached per filter combination."""
+    mask = np.ones(len(_df), dtype=bool)
+    if sel_mandal != "All":
+        mask &= (_df["Mandal"] == sel_mandal).to_numpy()
+    if show_pending:
+        mask &= ~_df["_is_completed"].to_numpy()
+    if show_issues:
+        mask &= _df["_has_issue"].to_numpy()
+    if show_priority:
+        mask &= (_df["Priority"] == 1).to_numpy()
+    return _df[mask]
+
+@st.cache_data(show_spinner=False, max_entries=MAX_FILTER_ENTRIES)
+def compute_department_summary(master_key, dept, sel_mandal, show_pending, show_issues, show_priority, _filtered_df):
+    """Computes the Department view snapshot and chart aggregates once per filter combination."""
+    d_total = len(_filtered_df)
+    d_completed = int(_filtered_df["_is_completed"].sum())
+    # count_by drops unused categories; Plotly's pie sorts slices by value itself
+    status_counts = count_by(_filtered_df, "Status Label").rename(columns={"Status Label": "Status"})
+    budget_mandal = _filtered_df.groupby("Mandal", observed=True)["Normalized Budget"].sum().reset_index()
+    total_dept_budget = budget_mandal["Normalized Budget"].sum()
+    budget_mandal["Percentage"] = (budget_mandal["Normalized Budget"] / total_dept_budget * 100).fillna(0)
+    budget_mandal["Label"] = [f"₹{budget:,.0f}L<br>({pct:.1f}%)" for budget, pct in zip(budget_mandal["Normalized Budget"].to_numpy(), budget_mandal["Percentage"].to_numpy())]
+    return {
+        "d_total": d_total,
+        "d_budget": _filtered_df["Normalized Budget"].sum(),
+        "d_completed": d_completed,
+        "status_counts": status_counts,
+        "budget_mandal": budget_mandal,
+    }
+
 @st.cache_data(ttl=600)
-def fetch_google_sheet(sheet_id):
+def fetch_google_sheet(sheet_id, etag=None):
+    """
+    Downloads the sheet as XLSX, conditionally on etag when given.
+    Returns (bytes, ETag); the bytes are None when the sheet is unchanged (HTTP 304) or on error.
+    """
     url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=xlsx"
+    headers = {"If-None-Match": etag} if etag else {}
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            return io.BytesIO(response.content)
-        else:
+        with requests.get(url, headers=headers, stream=True, timeout=20) as response:
+            if response.status_code == 304:
+                return None, etag
+            if response.status_code == 200:
+                # Single join of the streamed chunks; no intermediate bytearray to copy out of
+                content = b"".join(response.iter_content(64 * 1024))
+                return content, response.headers.get("ETag")
             st.error(f"Failed to download sheet. Status code: {response.status_code}")
-            return None
+            return None, None
     except Exception as e:
         st.error(f"Error fetching data from Google Sheets: {e}")
-        return None
+        return None, None
+
+# --- CHART BUILDERS ---
+# Figures are cached per data version with st.cache_resource (Plotly figures are
+# mutable objects, not hashable data); the leading-underscore frames are not hashed.
+# st.cache_resource is process-wide, so every builder is bounded with max_entries.
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_DATA_VERSIONS)
+def build_treemap(master_key, _project_type_counts):
+    """Hierarchical treemap of project counts by Department and Project Type."""
+    fig_treemap = px.treemap(
+        _project_type_counts, 
+        path=[px.Constant("All Projects"), 'Department', 'Project Type'], 
+        values='Count',
+        color='Project Type',
+        title="",
+        color_discrete_sequence=COLOR_SEQUENCE
+    )
+    
+    # Customize hover text and appearance
+    fig_treemap.data[0].textinfo = 'label+value'
+    fig_treemap.data[0].hovertemplate = (
+        '<b>%{label}</b><br>' +
+        'Projects: %{value}<br>' +
+        'Total: %{percentRoot:.1f}%<extra></extra>' 
+    )
+    # Apply professional styling and increased font size for readability
+    fig_treemap = update_fig_layout(fig_treemap)
+    fig_treemap.update_traces(textfont=dict(size=14))
+    fig_treemap.update_layout(margin = dict(t=0, l=0, r=0, b=0))
+    return fig_treemap
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_DATA_VERSIONS)
+def build_status_chart(master_key, _status_by_dept, _total_works_per_dept):
+    """100% stacked bar of project status per department."""
+    status_by_dept = _status_by_dept.copy()
+    
+    # Total works per department for X-axis label
+    total_works_per_dept = _total_works_per_dept.sort_values(by="Department") # Ensure sorting matches plot
+    # Reuse those totals as the percentage denominator instead of another groupby pass
+    dept_totals = status_by_dept["Department"].map(total_works_per_dept.set_index("Department")["Total Works"])
+    
+    # Prepare custom tick labels
+    dept_tickvals = total_works_per_dept["Department"].tolist()
+    dept_ticktext = [f"{dept}<br>({count} works)" for dept, count in zip(dept_tickvals, total_works_per_dept["Total Works"])]
+    
+    # Ensure percentage is calculated for each department
+    status_by_dept["Percentage"] = (status_by_dept["Count"] / dept_totals * 100).fillna(0)
+    # Label contains both count and percentage
+    status_by_dept["Label"] = status_by_dept["Count"].astype(str) + "<br>(" + status_by_dept["Percentage"].round().astype(int).astype(str) + "%)"
+    
+    fig_status = px.bar(
+        status_by_dept, 
+        x="Department", 
+        y="Percentage", 
+        color="Status Label", 
+        color_discrete_map=STATUS_COLOR_MAP, 
+        text="Label", 
+        barmode="stack", 
+        title=""
+    )
+    
+    # Apply professional styling
+    fig_status = update_fig_layout(fig_status)
+    
+    # Customization for the X-axis labels
+    fig_status.update_layout(
+        xaxis=dict(
+            tickmode='array',
+            tickvals=dept_tickvals,
+            ticktext=dept_ticktext,
+            title_text="Department" # Override default title
+        ),
+        yaxis_tickformat='.0f', 
+        yaxis_title='Percentage of Total Projects'
+    )
+    
+    fig_status.update_traces(textposition='inside', insidetextanchor='middle', textfont=dict(size=12))
+    return fig_status
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_DATA_VERSIONS)
+def build_issues_chart(master_key, _issues_count):
+    """Bar chart of reported issues per department."""
+    issues_count = _issues_count.copy()
+    total_issues_val = issues_count["Count"].sum()
+    issues_count["Percentage"] = (issues_count["Count"] / total_issues_val * 100).fillna(0)
+    issues_count["Label"] = [f"{count}<br>({pct:.1f}%)" for count, pct in zip(issues_count["Count"].to_numpy(), issues_count["Percentage"].to_numpy())]
+    
+    fig_issues = px.bar(issues_count, x="Department", y="Count", color="Department", text="Label", title="", color_discrete_sequence=COLOR_SEQUENCE)
+    # Apply professional styling and increased font size
+    fig_issues = update_fig_layout(fig_issues)
+    fig_issues.update_traces(textposition='outside', textfont=dict(size=12))
+    return fig_issues
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_FILTER_ENTRIES)
+def build_department_pie(master_key, dept, sel_mandal, show_pending, show_issues, show_priority, _status_counts):
+    """Donut chart of completion status for the filtered department works."""
+    fig_dept_pie = px.pie(_status_counts, values='Count', names='Status', hole=0.4, color='Status', color_discrete_map=STATUS_COLOR_MAP, title="Completion Status")
+    # Apply professional styling and increased font size
+    fig_dept_pie = update_fig_layout(fig_dept_pie)
+    fig_dept_pie.update_traces(textinfo='value+percent', textfont=dict(size=12))
+    return fig_dept_pie
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_FILTER_ENTRIES)
+def build_budget_by_mandal_chart(master_key, dept, sel_mandal, show_pending, show_issues, show_priority, _budget_mandal):
+    """Bar chart of the filtered department budget per Mandal."""
+    fig_dept_bar = px.bar(_budget_mandal, x="Mandal", y="Normalized Budget", title="Budget by Mandal", text="Label", color_discrete_sequence=COLOR_SEQUENCE)
+    # Apply professional styling and increased font size
+    fig_dept_bar = update_fig_layout(fig_dept_bar)
+    fig_dept_bar.update_traces(textposition='outside', textfont=dict(size=12))
+    return fig_dept_bar
 
 # --- MOCK DATA ---
+@st.cache_data(show_spinner=False)
 def get_mock_data():
+    """Demo department sheets, cleaned once and served from cache on reruns."""
     pr_df = pd.DataFrame({
         "Sl. No.": [1, 2, 3, 4, 5],
         "Work Name": ["PWD Road T02", "ZP Road Vajenepalli", "ZP Road Lingapur", "Anganwadi Center 1", "Anganwadi Center 2"],
@@ -299,13 +619,18 @@ if 'view' not in st.session_state:
     st.session_state.view = 'Home'
 if 'selected_dept' not in st.session_state:
     st.session_state.selected_dept = None
-# Initialize session state for data
-if 'data_sheets' not in st.session_state:
-    st.session_state.data_sheets = {}
+# Initialize session state for data (raw workbook bytes, or DEMO_SOURCE)
+if 'data_source' not in st.session_state:
+    st.session_state.data_source = None
 if 'last_source' not in st.session_state:
     st.session_state.last_source = None
 if 'uploaded_file_hash' not in st.session_state:
     st.session_state.uploaded_file_hash = None
+# Last Google Sheet download and its ETag, reused when the server answers 304 Not Modified
+if 'sheet_etag' not in st.session_state:
+    st.session_state.sheet_etag = None
+if 'sheet_bytes' not in st.session_state:
+    st.session_state.sheet_bytes = None
 
 def switch_view(view_name, dept=None):
     st.session_state.view = view_name
@@ -316,6 +641,8 @@ st.sidebar.header("Data Source")
 source_option = st.sidebar.radio("Select Source:", ["Google Sheet (Live)", "Upload Excel File", "Use Demo Data"])
 
 SHEET_ID = "13Um7uOhz_zAAvMqCpfO-tppyZPoRT6RK"
+DEMO_SOURCE = "demo"
+PRIORITY_ROW_LIMIT = 500 # Rows sent to the browser for the priority table by default
 
 # Logic to determine if a refresh/re-load is needed (e.g., source changed)
 needs_reload = False
@@ -325,41 +652,54 @@ if source_option != st.session_state.last_source:
 
 if source_option == "Google Sheet (Live)":
     # Reload if the button is pressed, or if it's the first time running this source AND no data exists
-    if st.sidebar.button("🔄 Refresh Data") or (needs_reload and not st.session_state.data_sheets):
-        st.cache_data.clear()
+    if st.sidebar.button("🔄 Refresh Data") or (needs_reload and not st.session_state.data_source):
+        fetch_google_sheet.clear()
         with st.spinner('Fetching data from Google Sheets...'):
-            excel_file = fetch_google_sheet(SHEET_ID)
-            if excel_file:
-                raw_sheets = load_data(excel_file)
-                if raw_sheets:
-                    temp_data_sheets = {sheet_name: clean_dataframe(df, sheet_name) for sheet_name, df in raw_sheets.items()}
-                    st.session_state.data_sheets = temp_data_sheets
-                    st.sidebar.success("Data Loaded Successfully!")
+            file_bytes, etag = fetch_google_sheet(SHEET_ID, st.session_state.sheet_etag)
+            if file_bytes:
+                st.session_state.sheet_bytes, st.session_state.sheet_etag = file_bytes, etag
+            elif etag: # Not modified: reuse the previous download
+                file_bytes = st.session_state.sheet_bytes
+            if file_bytes and load_data(file_bytes):
+                st.session_state.data_source = file_bytes
+                st.sidebar.success("Data Loaded Successfully!")
 
 elif source_option == "Upload Excel File":
     uploaded_file = st.sidebar.file_uploader("Upload Kataram Civil Works Excel", type=["xlsx", "xls"])
     
-    uploaded_file_hash = uploaded_file.file_id if uploaded_file else None
+    # Content hash rather than file_id, which can change across reruns for the same file
+    file_bytes = uploaded_file.getvalue() if uploaded_file else None
+    uploaded_file_hash = content_digest(file_bytes) if uploaded_file else None
     
     # Reload if a new file is uploaded (different hash) or if the source changed
     if uploaded_file and (uploaded_file_hash != st.session_state.uploaded_file_hash or needs_reload):
         with st.spinner('Processing uploaded file...'):
-            raw_sheets = load_data(uploaded_file)
-            if raw_sheets:
-                temp_data_sheets = {sheet_name: clean_dataframe(df, sheet_name) for sheet_name, df in raw_sheets.items()}
-                st.session_state.data_sheets = temp_data_sheets
+            if load_data(file_bytes):
+                st.session_state.data_source = file_bytes
                 st.session_state.uploaded_file_hash = uploaded_file_hash
                 st.sidebar.success("File Processed Successfully!")
-    elif not st.session_state.data_sheets:
+    elif not st.session_state.data_source:
         st.info("Please upload an Excel file to begin.")
         
 else: # Use Demo Data
-    if needs_reload or not st.session_state.data_sheets:
-        st.session_state.data_sheets = get_mock_data()
+    if needs_reload or not st.session_state.data_source:
+        st.session_state.data_source = DEMO_SOURCE
         st.sidebar.info("Using Demo Data.")
 
+# Resolve the active source to cleaned sheets (served from cache after the first build).
+# data_key identifies the data version for every downstream cache: the workbook digest, or DEMO_SOURCE.
+if st.session_state.data_source == DEMO_SOURCE:
+    data_sheets = get_mock_data()
+    data_key = DEMO_SOURCE
+elif st.session_state.data_source:
+    data_sheets = build_data_sheets(st.session_state.data_source)
+    data_key = content_digest(st.session_state.data_source)
+else:
+    data_sheets = {}
+    data_key = None
+
 # Stop if no data is loaded
-if not st.session_state.data_sheets:
+if not data_sheets:
     if source_option != "Upload Excel File": # Allow upload widget to persist
         st.stop()
     else:
@@ -368,14 +708,85 @@ if not st.session_state.data_sheets:
             st.stop()
 
 
-# Alias the session state data for easier access in the rest of the script
-data_sheets = st.session_state.data_sheets
-master_df = pd.concat(data_sheets.values(), ignore_index=True)
+# --- COMBINE SHEETS AND APPLY PROJECT CATEGORIZATION ---
+master_df = assemble_master(data_key, data_sheets)
+
+
+# --- DEPARTMENT VIEW ---
+@st.fragment
+def render_department(master_key, dept, df):
+    """Filters, snapshot, charts and works table for one department; filter changes rerun only this fragment."""
+    # Filters
+    f1, f2, f3, f4 = st.columns(4)
+    # Mandal is categorical after cleaning, so its distinct values are the category levels (no column scan);
+    # astype("category") builds those levels already sorted, so no re-sort is needed here
+    mandals = ["All"] + df["Mandal"].astype("category").cat.categories.tolist() if "Mandal" in df.columns else ["All"]
+    sel_mandal = f1.selectbox("Filter by Mandal", mandals)
+    show_pending = f2.toggle("Pending Only")
+    show_issues = f3.toggle("Issues Only")
+    show_priority = f4.toggle("⭐ Priority Only") 
+
+    filters = (sel_mandal, show_pending, show_issues, show_priority)
+    # Opening a department (no filters) uses the sheet as is, skipping the mask and a cached copy of the whole sheet
+    if filters == ("All", False, False, False):
+        filtered_df = df
+    else:
+        filtered_df = filter_department(master_key, dept, *filters, df)
 
+    # Stats
+    dept_summary = compute_department_summary(master_key, dept, *filters, filtered_df)
+    d_total = dept_summary["d_total"]
+    d_budget = dept_summary["d_budget"]
+    d_completed = dept_summary["d_completed"]
+    
+    st.markdown("#### Snapshot")
+    s1, s2, s3, s4 = st.columns(4)
+    s1.metric("Works", d_total)
+    s2.metric("Budget", f"₹{d_budget:,.1f} L")
+    s3.metric("Completed", d_completed)
+    s4.metric("Pending", d_total - d_completed)
+
+    st.divider()
+    st.subheader("📊 Analytics")
+    if not filtered_df.empty:
+        dc1, dc2 = st.columns(2)
+        with dc1:
+            fig_dept_pie = build_department_pie(master_key, dept, *filters, dept_summary["status_counts"])
+            st.plotly_chart(fig_dept_pie, use_container_width=True)
+        with dc2:
+            budget_mandal = dept_summary["budget_mandal"]
+            if not budget_mandal.empty:
+                fig_dept_bar = build_budget_by_mandal_chart(master_key, dept, *filters, budget_mandal)
+                st.plotly_chart(fig_dept_bar, use_container_width=True)
+    
+    st.markdown("#### Detailed Works List")
+    
+    # TABLE CONFIGURATION
+    # 1. Hide Normalized Budget, Status Label, Department, Priority, Is Completed
+    cols_to_hide = ["Normalized Budget", "Status Label", "Department", "Priority", "Is Completed", "Project Type", "_has_issue", "_is_completed"] 
+    
+    # 2. Prioritize Column Order: Sl. No, Work Name, Village, Mandal, Status...
+    desired_order = ["Sl. No.", "Work Name", "Village", "Mandal", "Status", "Budget (Lakhs)", "Issues", "Contractor", "Sanction Date"]
+    # Add remaining columns that are not in desired_order or cols_to_hide
+    remaining_cols = [c for c in filtered_df.columns if c not in desired_order and c not in cols_to_hide]
+    
+    final_cols = [c for c in desired_order if c in filtered_df.columns] + remaining_cols
+    
+    # 3. Column Configuration
+    table_config = {
+        "Work Name": st.column_config.TextColumn("Work Name", width="large"),
+        "Sl. No.": st.column_config.NumberColumn("Sl. No.", width="small"),
+        "Status": st.column_config.TextColumn("Status", width="medium"),
+        "Issues": st.column_config.TextColumn("Issues", width="medium"),
+    }
 
-# --- APPLY PROJECT CATEGORIZATION ---
-if not master_df.empty and "Work Name" in master_df.columns:
-    master_df["Project Type"] = master_df["Work Name"].apply(categorize_project_revised)
+    st.dataframe(
+        filtered_df[final_cols],
+        use_container_width=True,
+        hide_index=True,
+        height=500,
+        column_config=table_config
+    )
 
 
 # --- DASHBOARD LOGIC ---
@@ -400,16 +811,12 @@ if st.session_state.view == 'Home':
 
         with tab_summary:
             # KPIS
-            total_projects = len(master_df)
-            total_investment = master_df["Normalized Budget"].sum()
-            issues_df = master_df[
-                (master_df["Issues"].str.len() > 1) & 
-                (master_df["Issues"].str.lower() != "nan") & 
-                (master_df["Issues"].str.strip() != "-")
-            ]
-            total_issues = len(issues_df)
-            completed_total = len(master_df[master_df["Status Label"] == "Completed"])
-            completion_rate = int((completed_total / total_projects * 100)) if total_projects > 0 else 0
+            summary = compute_summary(data_key, master_df)
+            total_projects = summary["total_projects"]
+            total_investment = summary["total_investment"]
+            total_issues = summary["total_issues"]
+            completed_total = summary["completed_total"]
+            completion_rate = summary["completion_rate"]
 
             k1, k2, k3, k4 = st.columns(4)
             k1.metric("Total Projects", total_projects)
@@ -425,107 +832,31 @@ if st.session_state.view == 'Home':
             with c1:
                 st.subheader("🛠️ Project Count by Type")
                 
-                if "Project Type" in master_df.columns:
-                    # Group by Department and Project Type for hierarchical treemap
-                    project_type_counts = master_df.groupby(["Department", "Project Type"]).size().reset_index(name="Count")
-                    
-                    # Treemap
-                    fig_treemap = px.treemap(
-                        project_type_counts, 
-                        path=[px.Constant("All Projects"), 'Department', 'Project Type'], 
-                        values='Count',
-                        color='Project Type',
-                        title="",
-                        color_discrete_sequence=COLOR_SEQUENCE
-                    )
-                    
-                    # Customize hover text and appearance
-                    fig_treemap.data[0].textinfo = 'label+value'
-                    fig_treemap.data[0].hovertemplate = (
-                        '<b>%{label}</b><br>' +
-                        'Projects: %{value}<br>' +
-                        'Total: %{percentRoot:.1f}%<extra></extra>' 
-                    )
-                    # Apply professional styling and increased font size for readability
-                    fig_treemap = update_fig_layout(fig_treemap)
-                    fig_treemap.update_traces(textfont=dict(size=14))
-                    fig_treemap.update_layout(margin = dict(t=0, l=0, r=0, b=0))
-                    
+                if "project_type_counts" in summary:
+                    # Treemap of counts grouped by Department and Project Type
+                    fig_treemap = build_treemap(data_key, summary["project_type_counts"])
                     st.plotly_chart(fig_treemap, use_container_width=True)
                 else:
                     st.info("Work Name column is not available to categorize projects.")
 
             with c2:
                 st.subheader("📊 Project Status by Dept (100% Stacked)")
-                status_by_dept = master_df.groupby(["Department", "Status Label"]).size().reset_index(name="Count")
-                dept_totals = status_by_dept.groupby("Department")["Count"].transform("sum")
-                
-                # Calculate total works per department for X-axis label
-                total_works_per_dept = master_df.groupby("Department").size().reset_index(name="Total Works")
-                total_works_per_dept = total_works_per_dept.sort_values(by="Department") # Ensure sorting matches plot
-                
-                # Prepare custom tick labels
-                dept_tickvals = total_works_per_dept["Department"].tolist()
-                dept_ticktext = [f"{dept}<br>({count} works)" for dept, count in zip(dept_tickvals, total_works_per_dept["Total Works"])]
-                
-                # Ensure percentage is calculated for each department
-                status_by_dept["Percentage"] = (status_by_dept["Count"] / dept_totals * 100).fillna(0)
-                # Label contains both count and percentage
-                status_by_dept["Label"] = status_by_dept.apply(lambda x: f"{x['Count']}<br>({x['Percentage']:.0f}%)", axis=1)
-                
-                color_map = {"Completed": "#28a745", "In Progress": "#DC3545", "N/A": "#6c757d"} # Green/Red/Gray for status
-                
-                fig_status = px.bar(
-                    status_by_dept, 
-                    x="Department", 
-                    y="Percentage", 
-                    color="Status Label", 
-                    color_discrete_map=color_map, 
-                    text="Label", 
-                    barmode="stack", 
-                    title=""
-                )
-                
-                # Apply professional styling
-                fig_status = update_fig_layout(fig_status)
-                
-                # Customization for the X-axis labels
-                fig_status.update_layout(
-                    xaxis=dict(
-                        tickmode='array',
-                        tickvals=dept_tickvals,
-                        ticktext=dept_ticktext,
-                        title_text="Department" # Override default title
-                    ),
-                    yaxis_tickformat='.0f', 
-                    yaxis_title='Percentage of Total Projects'
-                )
-
-                fig_status.update_traces(textposition='inside', insidetextanchor='middle', textfont=dict(size=12))
+                fig_status = build_status_chart(data_key, summary["status_by_dept"], summary["total_works_per_dept"])
                 st.plotly_chart(fig_status, use_container_width=True)
 
             st.subheader("⚠️ Issues by Department")
-            if not issues_df.empty:
-                issues_count = issues_df.groupby("Department").size().reset_index(name="Count")
-                total_issues_val = issues_count["Count"].sum()
-                issues_count["Percentage"] = (issues_count["Count"] / total_issues_val * 100).fillna(0)
-                issues_count["Label"] = issues_count.apply(lambda x: f"{x['Count']}<br>({x['Percentage']:.1f}%)", axis=1)
-                
-                fig_issues = px.bar(issues_count, x="Department", y="Count", color="Department", text="Label", title="", color_discrete_sequence=COLOR_SEQUENCE)
-                # Apply professional styling and increased font size
-                fig_issues = update_fig_layout(fig_issues)
-                fig_issues.update_traces(textposition='outside', textfont=dict(size=12))
+            if total_issues:
+                fig_issues = build_issues_chart(data_key, summary["issues_count"])
                 st.plotly_chart(fig_issues, use_container_width=True)
             else:
                 st.info("No reported issues found.")
             
             st.divider()
             st.subheader("📂 Department Details")
-            dept_list = list(data_sheets.keys())
+            dept_rows = {name: len(df) for name, df in data_sheets.items()}
             cols = st.columns(4)
-            for i, dept in enumerate(dept_list):
+            for i, (dept, d_rows) in enumerate(dept_rows.items()):
                 with cols[i % 4]:
-                    d_rows = len(data_sheets[dept])
                     if st.button(f"{dept}\n({d_rows} Works)", key=f"btn_{dept}"):
                         switch_view('Department', dept)
                         st.rerun()
@@ -549,6 +880,11 @@ if st.session_state.view == 'Home':
                 # Order columns: Work Name first
                 cols_to_show = ["Sl. No.", "Work Name", "Department", "Village", "Mandal", "Status Label", "Budget (Lakhs)", "Issues", "Contractor"]
                 existing_cols = [c for c in cols_to_show if c in priority_df.columns]
+
+                # Large lists ship only the biggest works unless the user asks for all of them
+                if len(priority_df) > PRIORITY_ROW_LIMIT and not st.checkbox(f"Show all {len(priority_df)} priority projects"):
+                    priority_df = priority_df.nlargest(PRIORITY_ROW_LIMIT, "Normalized Budget")
+                    st.caption(f"Showing the {PRIORITY_ROW_LIMIT} largest projects by budget.")
                 
                 st.dataframe(
                     priority_df[existing_cols],
@@ -575,90 +911,4 @@ elif st.session_state.view == 'Department':
         with h2:
             st.title(f"{dept} Department")
 
-        # Filters
-        f1, f2, f3, f4 = st.columns(4)
-        mandals = ["All"] + sorted(df["Mandal"].unique().tolist()) if "Mandal" in df.columns else ["All"]
-        sel_mandal = f1.selectbox("Filter by Mandal", mandals)
-        show_pending = f2.toggle("Pending Only")
-        show_issues = f3.toggle("Issues Only")
-        show_priority = f4.toggle("⭐ Priority Only") 
-
-        filtered_df = df.copy()
-        if sel_mandal != "All":
-            filtered_df = filtered_df[filtered_df["Mandal"] == sel_mandal]
-        if show_pending:
-            filtered_df = filtered_df[filtered_df["Status Label"] != "Completed"]
-        if show_issues and "Issues" in filtered_df.columns:
-            filtered_df = filtered_df[
-                (filtered_df["Issues"].str.len() > 1) & 
-                (filtered_df["Issues"].str.lower() != "nan") & 
-                (filtered_df["Issues"].str.strip() != "-")
-            ]
-        if show_priority:
-            filtered_df = filtered_df[filtered_df["Priority"] == 1]
-
-        # Stats
-        d_total = len(filtered_df)
-        d_budget = filtered_df["Normalized Budget"].sum() if "Normalized Budget" in filtered_df.columns else 0
-        d_completed = len(filtered_df[filtered_df["Status Label"] == "Completed"])
-        
-        st.markdown("#### Snapshot")
-        s1, s2, s3, s4 = st.columns(4)
-        s1.metric("Works", d_total)
-        s2.metric("Budget", f"₹{d_budget:,.1f} L")
-        s3.metric("Completed", d_completed)
-        s4.metric("Pending", d_total - d_completed)
-
-        st.divider()
-        st.subheader("📊 Analytics")
-        if not filtered_df.empty:
-            dc1, dc2 = st.columns(2)
-            with dc1:
-                status_counts = filtered_df["Status Label"].value_counts().reset_index()
-                status_counts.columns = ["Status", "Count"]
-                color_map = {"Completed": "#28a745", "In Progress": "#DC3545", "N/A": "#6c757d"}
-                fig_dept_pie = px.pie(status_counts, values='Count', names='Status', hole=0.4, color='Status', color_discrete_map=color_map, title="Completion Status")
-                # Apply professional styling and increased font size
-                fig_dept_pie = update_fig_layout(fig_dept_pie)
-                fig_dept_pie.update_traces(textinfo='value+percent', textfont=dict(size=12))
-                st.plotly_chart(fig_dept_pie, use_container_width=True)
-            with dc2:
-                if "Mandal" in filtered_df.columns and "Normalized Budget" in filtered_df.columns:
-                    budget_mandal = filtered_df.groupby("Mandal")["Normalized Budget"].sum().reset_index()
-                    total_dept_budget = budget_mandal["Normalized Budget"].sum()
-                    budget_mandal["Percentage"] = (budget_mandal["Normalized Budget"] / total_dept_budget * 100).fillna(0)
-                    budget_mandal["Label"] = budget_mandal.apply(lambda x: f"₹{x['Normalized Budget']:,.0f}L<br>({x['Percentage']:.1f}%)", axis=1)
-                    fig_dept_bar = px.bar(budget_mandal, x="Mandal", y="Normalized Budget", title="Budget by Mandal", text="Label", color_discrete_sequence=COLOR_SEQUENCE)
-                    # Apply professional styling and increased font size
-                    fig_dept_bar = update_fig_layout(fig_dept_bar)
-                    fig_dept_bar.update_traces(textposition='outside', textfont=dict(size=12))
-                    st.plotly_chart(fig_dept_bar, use_container_width=True)
-        
-        st.markdown("#### Detailed Works List")
-        
-        # TABLE CONFIGURATION
-        # 1. Hide Normalized Budget, Status Label, Department, Priority, Is Completed
-        cols_to_hide = ["Normalized Budget", "Status Label", "Department", "Priority", "Is Completed", "Project Type"] 
-        
-        # 2. Prioritize Column Order: Sl. No, Work Name, Village, Mandal, Status...
-        desired_order = ["Sl. No.", "Work Name", "Village", "Mandal", "Status", "Budget (Lakhs)", "Issues", "Contractor", "Sanction Date"]
-        # Add remaining columns that are not in desired_order or cols_to_hide
-        remaining_cols = [c for c in filtered_df.columns if c not in desired_order and c not in cols_to_hide]
-        
-        final_cols = [c for c in desired_order if c in filtered_df.columns] + remaining_cols
-        
-        # 3. Column Configuration
-        table_config = {
-            "Work Name": st.column_config.TextColumn("Work Name", width="large"),
-            "Sl. No.": st.column_config.NumberColumn("Sl. No.", width="small"),
-            "Status": st.column_config.TextColumn("Status", width="medium"),
-            "Issues": st.column_config.TextColumn("Issues", width="medium"),
-        }
-
-        st.dataframe(
-            filtered_df[final_cols],
-            use_container_width=True,
-            hide_index=True,
-            height=500,
-            column_config=table_config
-        )
+        render_department(data_key, dept, df)